@@ -2,18 +2,12 @@ import streamlit as st
 import os
 import json
 import time
-import subprocess
-import requests
-from typing import List, Dict, Any, Optional
-import base64
-from dotenv import load_dotenv
-import anthropic
-import openai
-from pathlib import Path
-import toml
-
-# Load environment variables
-load_dotenv()
+import tempfile
+import functools
+from types import MappingProxyType
+from typing import Final
+from dataclasses import dataclass, field
+from dotenv import dotenv_values
 
 # Set page config
 st.set_page_config(
@@ -26,19 +20,48 @@ st.set_page_config(
 # Paths
 CONFIG_DIR = os.path.join(os.path.expanduser("~"), ".roo-pilot")
 CONFIG_FILE = os.path.join(CONFIG_DIR, "config.json")
-os.makedirs(CONFIG_DIR, exist_ok=True)
-
-# Default configuration
-DEFAULT_CONFIG = {
-    "api_provider": "anthropic",
-    "model": "claude-3-7-sonnet-20240229",
-    "temperature": 0.3,
-    "max_tokens": 4096,
-    "mode": "assistant",
-    "workspace_path": os.getcwd()
-}
-
-# Load configuration
+
+# Create the config directory once per process instead of on every rerun
+@st.cache_resource
+def ensure_config_dir():
+    os.makedirs(CONFIG_DIR, exist_ok=True)
+
+# Default configuration (built on demand so the workspace path reflects the current directory)
+def default_config():
+    return {
+        "api_provider": "anthropic",
+        "model": "claude-3-7-sonnet-20240229",
+        "temperature": 0.3,
+        "max_tokens": 4096,
+        "mode": "assistant",
+        "workspace_path": os.getcwd()
+    }
+
+# LLM providers shown in the sidebar and Settings page (read-only; insertion order is the display order)
+PROVIDER_OPTIONS = MappingProxyType({
+    "anthropic": "Anthropic (Claude)",
+    "openai": "OpenAI (GPT)",
+    "openrouter": "OpenRouter",
+    "bedrock": "AWS Bedrock",
+    "gemini": "Google Gemini",
+    "mistral": "Mistral AI",
+    "groq": "Groq (Fast inference)"
+})
+PROVIDER_KEYS = tuple(PROVIDER_OPTIONS)
+
+# Write configuration atomically: serialize once, write a unique temp file, then rename over the old one
+def write_config_file(config):
+    ensure_config_dir()
+    fd, tmp_path = tempfile.mkstemp(dir=CONFIG_DIR, prefix="config.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(json.dumps(config, separators=(',', ':')))
+        os.replace(tmp_path, CONFIG_FILE)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+# Load configuration from disk
 def load_config():
     if os.path.exists(CONFIG_FILE):
         try:
@@ -46,35 +69,92 @@ def load_config():
                 return json.load(f)
         except json.JSONDecodeError:
             st.error("Error loading configuration file. Using defaults.")
-            return DEFAULT_CONFIG
+            return default_config()
     else:
         # Create default config if it doesn't exist
-        with open(CONFIG_FILE, 'w') as f:
-            json.dump(DEFAULT_CONFIG, f, indent=2)
-        return DEFAULT_CONFIG
+        config = default_config()
+        write_config_file(config)
+        return config
+
+# Get this session's configuration; disk is only read on first access, later reruns reuse the dict
+def get_config():
+    if "config" not in st.session_state:
+        config = load_config()
+        st.session_state["config"] = config
+        st.session_state["saved_config"] = dict(config)
+    return st.session_state["config"]
+
+# Minimum delay between config writes, in seconds
+CONFIG_SAVE_DEBOUNCE = 0.5
 
-# Save configuration
+# Save configuration (the dict is updated in place; the disk write is deferred to flush_config)
 def save_config(config):
-    with open(CONFIG_FILE, 'w') as f:
-        json.dump(config, f, indent=2)
-
-# Get API keys from environment
-def get_api_keys():
-    keys = {
-        "anthropic": os.getenv("ANTHROPIC_API_KEY", ""),
-        "openai": os.getenv("OPENAI_API_KEY", ""),
-        "openrouter": os.getenv("OPENROUTER_API_KEY", ""),
-        "bedrock": os.getenv("AWS_ACCESS_KEY_ID", "") and os.getenv("AWS_SECRET_ACCESS_KEY", ""),
-        "gemini": os.getenv("GOOGLE_API_KEY", ""),
-        "mistral": os.getenv("MISTRAL_API_KEY", ""),
-        "groq": os.getenv("GROQ_API_KEY", "")
+    st.session_state["config_dirty"] = True
+
+# Write pending configuration changes to disk, at most once per debounce window
+def flush_config(config, force=False):
+    if not st.session_state.get("config_dirty"):
+        return
+    now = time.perf_counter()
+    if not force and now - st.session_state.get("config_saved_at", 0.0) < CONFIG_SAVE_DEBOUNCE:
+        return
+    # Only touch the disk when values actually changed
+    if st.session_state.get("saved_config") != config:
+        write_config_file(config)
+        st.session_state["saved_config"] = dict(config)
+    st.session_state["config_saved_at"] = now
+    st.session_state["config_dirty"] = False
+
+# Environment variables holding each provider's credentials (Bedrock needs both AWS keys)
+API_KEY_ENV = MappingProxyType({
+    "anthropic": ("ANTHROPIC_API_KEY",),
+    "openai": ("OPENAI_API_KEY",),
+    "openrouter": ("OPENROUTER_API_KEY",),
+    "bedrock": ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY"),
+    "gemini": ("GOOGLE_API_KEY",),
+    "mistral": ("MISTRAL_API_KEY",),
+    "groq": ("GROQ_API_KEY",)
+})
+
+# Variables set outside .env (which always win, as with load_dotenv) and the names .env last exported
+@st.cache_resource
+def _dotenv_environ():
+    return {"base": frozenset(os.environ), "exported": set()}
+
+# Export .env into the process environment (proxies, base URLs, AWS_REGION, ...) and snapshot the
+# credential variables into a read-only mapping reused by every rerun. Clearing this cache re-reads
+# the file, updating edited variables and unsetting ones deleted since the last load.
+@st.cache_resource
+def load_settings():
+    state = _dotenv_environ()
+    file_values = {
+        name: value
+        for name, value in dotenv_values().items()
+        if value is not None and name not in state["base"]
     }
-    return keys
+    for name in state["exported"] - file_values.keys():
+        os.environ.pop(name, None)
+    os.environ.update(file_values)
+    state["exported"] = set(file_values)
+    return MappingProxyType({
+        name: os.environ.get(name, "")
+        for names in API_KEY_ENV.values()
+        for name in names
+    })
+
+# Get the API key for a provider ("" if any required variable is unset)
+def get_api_key(provider):
+    settings = load_settings()
+    value = ""
+    for name in API_KEY_ENV.get(provider, ()):
+        value = settings[name]
+        if not value:
+            return ""
+    return value
 
 # Check if API key is available
 def has_api_key(provider):
-    keys = get_api_keys()
-    return bool(keys.get(provider, ""))
+    return bool(get_api_key(provider))
 
 # Create .env file template
 def create_env_template(path=".env.template"):
@@ -109,74 +189,107 @@ def create_env_template(path=".env.template"):
     return template
 
 # Model metadata class
+@dataclass(frozen=True)
 class ModelInfo:
-    def __init__(self, name, display_name, supports_vision=False, context_window=4096, speed=2, reasoning=2):
-        self.name = name
-        self.display_name = display_name
-        self.supports_vision = supports_vision
-        self.context_window = context_window
-        self.speed = speed  # 1-3 (1=fast, 3=slow)
-        self.reasoning = reasoning  # 1-3 (1=basic, 3=advanced)
-    
-    def __str__(self):
+    name: str
+    display_name: str
+    supports_vision: bool = False
+    context_window: int = 4096
+    speed: int = 2  # 1-3 (1=fast, 3=slow)
+    reasoning: int = 2  # 1-3 (1=basic, 3=advanced)
+    display: str = field(init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        # Build the selectbox label once instead of on every rerun
         vision_indicator = "👁️ " if self.supports_vision else ""
         ctx_size = f"{round(self.context_window/1000)}K"
         speed_indicator = "⚡" * self.speed
         reasoning_indicator = "🧠" * self.reasoning
-        return f"{vision_indicator}{self.display_name} ({ctx_size} ctx) {speed_indicator} {reasoning_indicator}"
+        object.__setattr__(
+            self,
+            "display",
+            f"{vision_indicator}{self.display_name} ({ctx_size} ctx) {speed_indicator} {reasoning_indicator}"
+        )
+    
+    def __str__(self):
+        return self.display
 
-# Cached models dictionary to store API-fetched models
-cached_models = {}
+# LLM clients, cached per API key so their connection pools are reused across messages
+@st.cache_resource
+def _anthropic_client(api_key):
+    import anthropic
+    return anthropic.Anthropic(api_key=api_key)
 
-# Fetch models directly from provider API
-async def fetch_models_from_provider(provider):
-    try:
-        if provider == "openai" and os.getenv("OPENAI_API_KEY"):
-            client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-            response = client.models.list()
-            
-            # Filter for chat models
-            chat_models = [model for model in response.data if "gpt" in model.id and not "instruct" in model.id]
-            
-            return [
-                ModelInfo(
-                    model.id, 
-                    model.id,
-                    supports_vision="vision" in model.id or "gpt-4" in model.id,
-                    context_window=128000 if "gpt-4" in model.id else 16385,
-                    speed=3 if "gpt-3.5" in model.id else 2,
-                    reasoning=3 if "gpt-4" in model.id else 2
-                )
-                for model in chat_models
-            ]
+@st.cache_resource
+def _openai_client(api_key, base_url=None):
+    import openai
+    return openai.OpenAI(api_key=api_key, base_url=base_url)
+
+@st.cache_resource
+def _mistral_client(api_key):
+    from mistralai.client import MistralClient
+    return MistralClient(api_key=api_key)
+
+# Shared HTTP session for OpenRouter so TLS connections are kept alive between messages
+@st.cache_resource
+def _openrouter_session():
+    import requests
+    from requests.adapters import HTTPAdapter
+    
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=4))
+    return session
+
+# Drop cached LLM clients and sessions so the next request builds fresh ones
+def reset_llm_clients():
+    for factory in (_anthropic_client, _openai_client, _mistral_client, _openrouter_session):
+        factory.clear()
+
+# Fetch models directly from provider API (errors propagate so failed fetches are never cached)
+def fetch_models_from_provider(provider):
+    if provider == "openai" and has_api_key("openai"):
+        client = _openai_client(get_api_key("openai"))
+        response = client.models.list()
         
-        elif provider == "groq" and os.getenv("GROQ_API_KEY"):
-            # Groq uses OpenAI's API structure
-            client = openai.OpenAI(
-                api_key=os.getenv("GROQ_API_KEY"),
-                base_url="https://api.groq.com/openai/v1"
-            )
-            
-            response = client.models.list()
-            
-            return [
-                ModelInfo(
-                    model.id,
-                    model.id,
-                    supports_vision="claude" in model.id,
-                    context_window=200000 if "claude" in model.id else 
-                               32768 if "mixtral" in model.id else 8192,
-                    speed=3,  # Groq is generally fast
-                    reasoning=3 if "70b" in model.id or "claude" in model.id else 2
-                )
-                for model in response.data
-            ]
+        # Filter for chat models and derive metadata in a single pass
+        models = []
+        for model in response.data:
+            mid = model.id
+            if "gpt" not in mid or "instruct" in mid:
+                continue
+            is_gpt4 = "gpt-4" in mid
+            models.append(ModelInfo(
+                mid,
+                mid,
+                supports_vision=is_gpt4 or "vision" in mid,
+                context_window=128000 if is_gpt4 else 16385,
+                speed=3 if "gpt-3.5" in mid else 2,
+                reasoning=3 if is_gpt4 else 2
+            ))
+        return models
+    
+    elif provider == "groq" and has_api_key("groq"):
+        # Groq uses OpenAI's API structure
+        client = _openai_client(get_api_key("groq"), base_url="https://api.groq.com/openai/v1")
         
-        # Add support for more providers here
+        response = client.models.list()
         
-    except Exception as e:
-        st.error(f"Error fetching models: {str(e)}")
-        return None
+        models = []
+        for model in response.data:
+            mid = model.id
+            is_claude = "claude" in mid
+            models.append(ModelInfo(
+                mid,
+                mid,
+                supports_vision=is_claude,
+                context_window=200000 if is_claude else 
+                           32768 if "mixtral" in mid else 8192,
+                speed=3,  # Groq is generally fast
+                reasoning=3 if is_claude or "70b" in mid else 2
+            ))
+        return models
+    
+    # Add support for more providers here
     
     return None
 
@@ -232,187 +345,191 @@ def get_fallback_models_metadata(provider):
     else:
         return []
 
-# Get available models for a provider
-def get_available_models(provider):
-    # Use cached models if available  
-    if provider in cached_models:
-        return [model.name for model in cached_models[provider]]
-    
-    # Try to fetch models from provider API
-    try:
-        import asyncio
-        models = asyncio.run(fetch_models_from_provider(provider))
-        if models:
-            cached_models[provider] = models
-            return [model.name for model in models]
-    except Exception as e:
-        st.error(f"Error fetching models: {str(e)}")
-    
-    # Fall back to hardcoded models if API fetch fails
-    fallback_models = get_fallback_models_metadata(provider)
-    cached_models[provider] = fallback_models
-    return [model.name for model in fallback_models]
+# Cache API-fetched models across reruns as plain tuples (ModelInfo is rebuilt by the caller).
+# Fetch errors escape this function, so st.cache_data only stores successful results.
+@st.cache_data(ttl=3600, show_spinner=False)
+def _fetch_models_cached(provider):
+    models = fetch_models_from_provider(provider)
+    if not models:
+        return None
+    return [
+        (m.name, m.display_name, m.supports_vision, m.context_window, m.speed, m.reasoning)
+        for m in models
+    ]
 
-# Get detailed model metadata
-def get_provider_models_metadata(provider):
-    # Use cached models if available
-    if provider in cached_models:
-        return cached_models[provider]
-    
-    # Try to fetch models from provider API
+# Models fetched from the provider API (cached), or the hardcoded list if the provider has none; raises on fetch errors
+def _load_models(provider):
+    rows = _fetch_models_cached(provider)
+    if rows:
+        return [ModelInfo(*row) for row in rows]
+    return get_fallback_models_metadata(provider)
+
+# Sidebar model choices as {label: (name, supports_vision)}
+def _model_choices(models):
+    return {model.display: (model.name, model.supports_vision) for model in models}
+
+# Cached so reruns skip rebuilding ModelInfo labels; like _fetch_models_cached, failures are not stored
+@st.cache_data(ttl=3600, show_spinner=False)
+def _model_choices_cached(provider):
+    return _model_choices(_load_models(provider))
+
+def get_model_choices(provider):
     try:
-        import asyncio
-        models = asyncio.run(fetch_models_from_provider(provider))
-        if models:
-            cached_models[provider] = models
-            return models
+        return _model_choices_cached(provider)
     except Exception as e:
+        # Fall back to hardcoded models if API fetch fails
         st.error(f"Error fetching models: {str(e)}")
-    
-    # Fall back to hardcoded models if API fetch fails
-    fallback_models = get_fallback_models_metadata(provider)
-    cached_models[provider] = fallback_models
-    return fallback_models
+        return _model_choices(get_fallback_models_metadata(provider))
 
-# Send message to LLM and get response
-def generate_response(provider, model, messages, system_prompt="", temperature=0.3, max_tokens=4096):
+# Prepend the system prompt (if any) to the chat history, which is already in role/content form
+def with_system_prompt(messages, system_prompt):
+    if system_prompt:
+        return [{"role": "system", "content": system_prompt}, *messages]
+    return messages
+
+# Yield the text deltas from an OpenAI-style stream of chat completion chunks
+def _delta_text(chunks):
+    for chunk in chunks:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+# Yield the text deltas from OpenRouter's server-sent events stream
+def _openrouter_text(response):
+    # Event streams carry no charset, and requests would otherwise assume Latin-1
+    response.encoding = "utf-8"
+    for line in response.iter_lines(decode_unicode=True):
+        # Skip keep-alive comments and blank separators
+        if not line or not line.startswith("data: "):
+            continue
+        data = line[len("data: "):]
+        if data == "[DONE]":
+            break
+        delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+        if delta:
+            yield delta
+
+# Send message to LLM and stream the response text as it is generated
+def stream_response(provider, model, messages, system_prompt="", temperature=0.3, max_tokens=4096):
     try:
         if provider == "anthropic":
-            client = anthropic.Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
-            
-            # Format messages for Anthropic
-            formatted_messages = []
-            for msg in messages:
-                formatted_messages.append({
-                    "role": msg["role"],
-                    "content": msg["content"]
-                })
+            client = _anthropic_client(get_api_key("anthropic"))
             
-            response = client.messages.create(
+            # Chat history already has the role/content shape Anthropic expects
+            with client.messages.stream(
                 model=model,
                 system=system_prompt,
-                messages=formatted_messages,
+                messages=messages,
                 temperature=temperature,
                 max_tokens=max_tokens
-            )
-            return response.content[0].text
+            ) as stream:
+                yield from stream.text_stream
             
         elif provider == "openai":
-            client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+            client = _openai_client(get_api_key("openai"))
             
             # Format messages for OpenAI
-            formatted_messages = []
-            if system_prompt:
-                formatted_messages.append({"role": "system", "content": system_prompt})
-            
-            for msg in messages:
-                formatted_messages.append({
-                    "role": msg["role"],
-                    "content": msg["content"]
-                })
+            formatted_messages = with_system_prompt(messages, system_prompt)
             
             response = client.chat.completions.create(
                 model=model,
                 messages=formatted_messages,
                 temperature=temperature,
-                max_tokens=max_tokens
+                max_tokens=max_tokens,
+                stream=True
             )
-            return response.choices[0].message.content
+            yield from _delta_text(response)
             
         elif provider == "openrouter":
             # Using OpenRouter API
             url = "https://openrouter.ai/api/v1/chat/completions"
             headers = {
-                "Authorization": f"Bearer {os.getenv('OPENROUTER_API_KEY')}",
+                "Authorization": f"Bearer {get_api_key('openrouter')}",
                 "Content-Type": "application/json"
             }
             
             # Format messages for OpenRouter
-            formatted_messages = []
-            if system_prompt:
-                formatted_messages.append({"role": "system", "content": system_prompt})
-            
-            for msg in messages:
-                formatted_messages.append({
-                    "role": msg["role"],
-                    "content": msg["content"]
-                })
+            formatted_messages = with_system_prompt(messages, system_prompt)
             
             payload = {
                 "model": model,
                 "messages": formatted_messages,
                 "temperature": temperature,
-                "max_tokens": max_tokens
+                "max_tokens": max_tokens,
+                "stream": True
             }
             
-            response = requests.post(url, headers=headers, json=payload)
-            response.raise_for_status()
-            return response.json()["choices"][0]["message"]["content"]
+            with _openrouter_session().post(url, headers=headers, json=payload, timeout=(5, 60), stream=True) as response:
+                response.raise_for_status()
+                yield from _openrouter_text(response)
             
         elif provider == "groq":
             # Using Groq API (compatible with OpenAI client)
-            client = openai.OpenAI(
-                api_key=os.getenv("GROQ_API_KEY"),
-                base_url="https://api.groq.com/openai/v1"
-            )
+            client = _openai_client(get_api_key("groq"), base_url="https://api.groq.com/openai/v1")
             
             # Format messages for Groq
-            formatted_messages = []
-            if system_prompt:
-                formatted_messages.append({"role": "system", "content": system_prompt})
-            
-            for msg in messages:
-                formatted_messages.append({
-                    "role": msg["role"],
-                    "content": msg["content"]
-                })
+            formatted_messages = with_system_prompt(messages, system_prompt)
             
             response = client.chat.completions.create(
                 model=model,
                 messages=formatted_messages,
                 temperature=temperature,
-                max_tokens=max_tokens
+                max_tokens=max_tokens,
+                stream=True
             )
-            return response.choices[0].message.content
+            yield from _delta_text(response)
             
         elif provider == "mistral":
-            import mistralai
-            from mistralai.client import MistralClient
             from mistralai.models.chat_completion import ChatMessage
             
-            client = MistralClient(api_key=os.getenv("MISTRAL_API_KEY"))
+            client = _mistral_client(get_api_key("mistral"))
             
             # Format messages for Mistral
-            formatted_messages = []
-            if system_prompt:
-                formatted_messages.append(ChatMessage(role="system", content=system_prompt))
-            
-            for msg in messages:
-                formatted_messages.append(ChatMessage(
-                    role=msg["role"],
-                    content=msg["content"]
-                ))
+            formatted_messages = [
+                ChatMessage(role=msg["role"], content=msg["content"])
+                for msg in with_system_prompt(messages, system_prompt)
+            ]
             
-            response = client.chat(
+            response = client.chat_stream(
                 model=model,
                 messages=formatted_messages,
                 temperature=temperature,
                 max_tokens=max_tokens
             )
-            return response.choices[0].message.content
+            yield from _delta_text(response)
         
         else:
-            return f"Provider {provider} is not fully implemented yet."
+            yield f"Provider {provider} is not fully implemented yet."
     
     except Exception as e:
         st.error(f"Error generating response: {str(e)}")
-        return f"Error: {str(e)}"
+        yield f"Error: {str(e)}"
 
 # File operations
-def read_file(path):
+# Largest file preview returned by read_file, in bytes
+MAX_PREVIEW_BYTES = 262144
+
+# Previews are cached by (path, mtime, size), so edited files invalidate themselves without a TTL
+@st.cache_data(max_entries=64, show_spinner=False)
+def _read_file_cached(path, mtime_ns, size, max_bytes):
+    # Read one byte past the cap to detect truncation without loading the whole file
+    with open(path, 'rb', buffering=65536) as f:
+        data = f.read(max_bytes + 1)
+    
+    # NUL bytes near the start mean a binary file that st.code can't display
+    if b"\0" in data[:8192]:
+        return f"Binary file not shown: {path}"
+    
+    content = data[:max_bytes].decode('utf-8', errors='replace')
+    # Match text-mode universal newlines, which the binary read bypasses
+    content = content.replace("\r\n", "\n").replace("\r", "\n")
+    if len(data) > max_bytes:
+        content += "\n... [truncated]"
+    return content
+
+def read_file(path, max_bytes=MAX_PREVIEW_BYTES):
     try:
-        with open(path, 'r', encoding='utf-8') as f:
-            return f.read()
+        stat = os.stat(path)
+        return _read_file_cached(path, stat.st_mtime_ns, stat.st_size, max_bytes)
     except Exception as e:
         return f"Error reading file: {str(e)}"
 
@@ -425,18 +542,20 @@ def write_file(path, content):
     except Exception as e:
         return f"Error writing file: {str(e)}"
 
+# Listings are cached briefly so widget reruns don't rescan the same directory
+@st.cache_data(ttl=5, max_entries=64, show_spinner=False)
 def list_files(directory):
     try:
-        items = os.listdir(directory)
         files = []
         dirs = []
         
-        for item in items:
-            full_path = os.path.join(directory, item)
-            if os.path.isdir(full_path):
-                dirs.append(f"📁 {item}")
-            else:
-                files.append(f"📄 {item}")
+        # scandir reports the entry type from the directory listing, avoiding a stat per item
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    dirs.append(f"📁 {entry.name}")
+                else:
+                    files.append(f"📄 {entry.name}")
         
         return dirs + files
     except Exception as e:
@@ -448,28 +567,27 @@ def render_sidebar():
     st.sidebar.markdown("---")
     
     # Navigation
-    page = st.sidebar.radio("Navigation", ["Chat", "Settings", "File Browser", "Documentation"])
+    page = st.sidebar.radio("Navigation", list(PAGES))
     
     # Load configuration
-    config = load_config()
+    config = get_config()
     
     # API provider selection and status
     st.sidebar.markdown("### LLM Provider")
-    provider_options = {
-        "anthropic": "Anthropic (Claude)",
-        "openai": "OpenAI (GPT)",
-        "openrouter": "OpenRouter",
-        "bedrock": "AWS Bedrock",
-        "gemini": "Google Gemini",
-        "mistral": "Mistral AI",
-        "groq": "Groq (Fast inference)"
+    default_provider_index = (
+        PROVIDER_KEYS.index(config['api_provider']) if config['api_provider'] in PROVIDER_OPTIONS else 0
+    )
+    # Check each provider's key once per rerun rather than inside format_func
+    provider_labels = {
+        provider: f"{name} {'✅' if has_api_key(provider) else '❌'}"
+        for provider, name in PROVIDER_OPTIONS.items()
     }
     
     selected_provider = st.sidebar.selectbox(
         "Select provider",
-        list(provider_options.keys()),
-        format_func=lambda x: f"{provider_options[x]} {'✅' if has_api_key(x) else '❌'}",
-        index=list(provider_options.keys()).index(config['api_provider']) if config['api_provider'] in provider_options else 0
+        PROVIDER_KEYS,
+        format_func=provider_labels.__getitem__,
+        index=default_provider_index
     )
     
     if selected_provider != config['api_provider']:
@@ -477,7 +595,7 @@ def render_sidebar():
         save_config(config)
     
     if not has_api_key(selected_provider):
-        st.sidebar.warning(f"No API key found for {provider_options[selected_provider]}. Add it to your .env file.")
+        st.sidebar.warning(f"No API key found for {PROVIDER_OPTIONS[selected_provider]}. Add it to your .env file.")
         if st.sidebar.button("Create .env Template"):
             template = create_env_template()
             st.sidebar.code(template, language="bash")
@@ -490,25 +608,15 @@ def render_sidebar():
     
     # Model selection with detailed info
     with st.sidebar.status("Fetching available models..."):
-        model_metadata = get_provider_models_metadata(selected_provider)
-    
-    model_options = []
-    model_dict = {}
-    vision_enabled = False
+        model_choices = get_model_choices(selected_provider)
     
-    for model in model_metadata:
-        model_display = str(model)
-        model_options.append(model_display)
-        model_dict[model_display] = model.name
-        if model.name == config.get('model') and model.supports_vision:
-            vision_enabled = True
+    model_options = list(model_choices)
     
     # Default index for model selection
-    default_index = 0
-    for i, model in enumerate(model_metadata):
-        if model.name == config.get('model'):
-            default_index = i
-            break
+    default_index = next(
+        (i for i, (name, _) in enumerate(model_choices.values()) if name == config.get('model')),
+        0
+    )
     
     st.sidebar.markdown("### Model Selection")
     selected_model_display = st.sidebar.selectbox(
@@ -519,52 +627,49 @@ def render_sidebar():
     )
     
     # Update configuration if model changed
-    selected_model = model_dict[selected_model_display]
+    selected_model, supports_vision = model_choices[selected_model_display]
     if selected_model != config.get('model'):
         config['model'] = selected_model
         # Update vision capability based on selected model
-        for model in model_metadata:
-            if model.name == selected_model:
-                config['vision_enabled'] = model.supports_vision
-                break
+        config['vision_enabled'] = supports_vision
         save_config(config)
     
-    if selected_model != config['model']:
-        config['model'] = selected_model
-        save_config(config)
-    
-    # Temperature
-    temperature = st.sidebar.slider(
-        "Temperature",
-        min_value=0.0,
-        max_value=1.0,
-        value=config['temperature'],
-        step=0.1
-    )
+    # Generation settings are batched in a form, so edits cause a single rerun when applied
+    with st.sidebar.form("generation_settings"):
+        # Temperature
+        temperature = st.slider(
+            "Temperature",
+            min_value=0.0,
+            max_value=1.0,
+            value=config['temperature'],
+            step=0.1
+        )
+        
+        # Max tokens
+        max_tokens = st.slider(
+            "Max Tokens",
+            min_value=1000,
+            max_value=32000,
+            value=config['max_tokens'],
+            step=1000
+        )
+        
+        # Workspace path
+        workspace_path = st.text_input(
+            "Workspace Path",
+            value=config['workspace_path']
+        )
+        
+        st.form_submit_button("Apply")
     
     if temperature != config['temperature']:
         config['temperature'] = temperature
         save_config(config)
     
-    # Max tokens
-    max_tokens = st.sidebar.slider(
-        "Max Tokens",
-        min_value=1000,
-        max_value=32000,
-        value=config['max_tokens'],
-        step=1000
-    )
-    
     if max_tokens != config['max_tokens']:
         config['max_tokens'] = max_tokens
         save_config(config)
     
-    # Workspace path
-    workspace_path = st.sidebar.text_input(
-        "Workspace Path",
-        value=config['workspace_path']
-    )
-    
     if workspace_path != config['workspace_path']:
         if os.path.exists(workspace_path):
             config['workspace_path'] = workspace_path
@@ -577,13 +682,95 @@ def render_sidebar():
     
     return page, config
 
+# Slash command handlers; each takes the command arguments, config and chat history and returns the reply
+def _cmd_read(args, config, messages):
+    if not args:
+        return "Please specify a file path to read."
+    path = os.path.join(config['workspace_path'], args) if not os.path.isabs(args) else args
+    return f"**File: {args}**\n```\n{read_file(path)}\n```"
+
+def _cmd_write(args, config, messages):
+    try:
+        # Format should be /write path content
+        path, _, content = args.partition(" ")
+        
+        full_path = os.path.join(config['workspace_path'], path) if not os.path.isabs(path) else path
+        response = write_file(full_path, content)
+        # Make the new file show up in listings right away
+        list_files.clear()
+        return response
+    except Exception as e:
+        return f"Error: {str(e)}\nUsage: /write path content"
+
+def _cmd_ls(args, config, messages):
+    path = os.path.join(config['workspace_path'], args) if args else config['workspace_path']
+    files = list_files(path)
+    return f"**Directory: {path}**\n" + "\n".join(files)
+
+def _cmd_clear(args, config, messages):
+    messages.clear()
+    return "Chat history cleared."
+
+def _cmd_help(args, config, messages):
+    return """
+    **Roo Pilot Commands:**
+    
+    `/read path` - Read file content
+    `/write path content` - Write content to a file
+    `/ls [path]` - List files in a directory
+    `/clear` - Clear chat history
+    `/help` - Show this help message
+    """
+
+# Slash commands by name (without the leading "/")
+COMMANDS: Final = MappingProxyType({
+    "read": _cmd_read,
+    "write": _cmd_write,
+    "ls": _cmd_ls,
+    "clear": _cmd_clear,
+    "help": _cmd_help
+})
+
+# Run a slash command from the chat input and return the assistant's reply
+def run_chat_command(prompt, config, messages):
+    command, _, args = prompt[1:].partition(" ")
+    command = command.lower()
+    
+    handler = COMMANDS.get(command)
+    if handler is None:
+        return f"Unknown command: {command}"
+    return handler(args, config, messages)
+
+# Chat input callback: slash commands are handled before the rerun, so the page renders their result directly
+def handle_chat_command(config):
+    prompt = st.session_state.get("chat_prompt")
+    if not prompt or not prompt.startswith("/"):
+        return
+    
+    messages = st.session_state.setdefault("messages", [])
+    messages.append({"role": "user", "content": prompt})
+    response = run_chat_command(prompt, config, messages)
+    messages.append({"role": "assistant", "content": response})
+
+# Show "Thinking..." in the current container until the first chunk of a streamed reply arrives
+def _with_thinking(chunks):
+    placeholder = st.empty()
+    placeholder.markdown("Thinking...")
+    try:
+        chunks = iter(chunks)
+        first = next(chunks, None)
+    finally:
+        placeholder.empty()
+    if first is not None:
+        yield first
+        yield from chunks
+
 # Chat UI
 def render_chat_page(config):
     st.title("Roo Pilot Chat")
     
-    # Initialize chat history
-    if "messages" not in st.session_state:
-        st.session_state.messages = []
+    # Initialize chat history (kept in session_state and appended to in place)
+    messages = st.session_state.setdefault("messages", [])
     
     # Define system prompt
     mode = config.get('mode', 'assistant')
@@ -596,123 +783,89 @@ def render_chat_page(config):
         You can assist with a wide range of tasks while being mindful of limitations."""
     
     # Display chat messages
-    for message in st.session_state.messages:
+    for message in messages:
         with st.chat_message(message["role"]):
             st.markdown(message["content"])
     
-    # Input for new message
-    if prompt := st.chat_input("Ask Roo Pilot..."):
+    # Input for new message (slash commands are already in the history via the callback)
+    prompt = st.chat_input(
+        "Ask Roo Pilot...",
+        key="chat_prompt",
+        on_submit=handle_chat_command,
+        args=(config,)
+    )
+    if prompt and not prompt.startswith("/"):
         # Don't process if no API key
         if not has_api_key(config['api_provider']):
             st.error(f"No API key found for {config['api_provider']}. Please add it to your .env file.")
             return
         
         # Add user message to chat history
-        st.session_state.messages.append({"role": "user", "content": prompt})
+        messages.append({"role": "user", "content": prompt})
         with st.chat_message("user"):
             st.markdown(prompt)
         
-        # Check for special commands
-        if prompt.startswith("/"):
-            parts = prompt[1:].split(" ", 1)
-            command = parts[0].lower()
-            args = parts[1] if len(parts) > 1 else ""
-            
-            # Handle commands
-            if command == "read":
-                if not args:
-                    response = "Please specify a file path to read."
-                else:
-                    path = os.path.join(config['workspace_path'], args) if not os.path.isabs(args) else args
-                    response = f"**File: {args}**\n```\n{read_file(path)}\n```"
-            
-            elif command == "write":
-                try:
-                    # Format should be /write path content
-                    file_parts = args.split(" ", 1)
-                    path = file_parts[0]
-                    content = file_parts[1] if len(file_parts) > 1 else ""
-                    
-                    full_path = os.path.join(config['workspace_path'], path) if not os.path.isabs(path) else path
-                    response = write_file(full_path, content)
-                except Exception as e:
-                    response = f"Error: {str(e)}\nUsage: /write path content"
-            
-            elif command == "ls":
-                path = os.path.join(config['workspace_path'], args) if args else config['workspace_path']
-                files = list_files(path)
-                response = f"**Directory: {path}**\n" + "\n".join(files)
-            
-            elif command == "clear":
-                st.session_state.messages = []
-                response = "Chat history cleared."
-            
-            elif command == "help":
-                response = """
-                **Roo Pilot Commands:**
-                
-                `/read path` - Read file content
-                `/write path content` - Write content to a file
-                `/ls [path]` - List files in a directory
-                `/clear` - Clear chat history
-                `/help` - Show this help message
-                """
-            else:
-                response = f"Unknown command: {command}"
-            
-            # Add response to chat history
-            st.session_state.messages.append({"role": "assistant", "content": response})
-            with st.chat_message("assistant"):
+        # Generate regular response, rendering tokens as they arrive
+        with st.chat_message("assistant"):
+            try:
+                response = st.write_stream(_with_thinking(stream_response(
+                    provider=config['api_provider'],
+                    model=config['model'],
+                    messages=messages,
+                    system_prompt=system_prompt,
+                    temperature=config['temperature'],
+                    max_tokens=config['max_tokens']
+                )))
+            except Exception as e:
+                response = f"Error: {str(e)}"
                 st.markdown(response)
-        
-        else:
-            # Generate regular response
-            with st.chat_message("assistant"):
-                message_placeholder = st.empty()
-                message_placeholder.markdown("Thinking...")
-                
-                try:
-                    response = generate_response(
-                        provider=config['api_provider'],
-                        model=config['model'],
-                        messages=st.session_state.messages,
-                        system_prompt=system_prompt,
-                        temperature=config['temperature'],
-                        max_tokens=config['max_tokens']
-                    )
-                    
-                    message_placeholder.markdown(response)
-                    st.session_state.messages.append({"role": "assistant", "content": response})
-                except Exception as e:
-                    message_placeholder.markdown(f"Error: {str(e)}")
-                    st.session_state.messages.append({"role": "assistant", "content": f"Error: {str(e)}"})
+            
+            messages.append({"role": "assistant", "content": response})
+
+# Run a page as a fragment, so its own widgets rerun only the page body rather than the whole script
+def page_fragment(render):
+    @st.fragment
+    @functools.wraps(render)
+    def fragment(config):
+        render(config)
+        # main() (and its Save button) doesn't run on fragment reruns, so write changes now;
+        # each fragment rerun is a single user action, so there is nothing to debounce
+        flush_config(config, force=True)
+    return fragment
 
 # Settings UI
+@page_fragment
 def render_settings_page(config):
     st.title("Settings")
     
     st.markdown("### Environment Setup")
     
     # Show current API key status
-    api_keys = get_api_keys()
     st.markdown("#### API Keys Status")
     
-    for provider, name in {
-        "anthropic": "Anthropic (Claude)",
-        "openai": "OpenAI (GPT)",
-        "openrouter": "OpenRouter",
-        "bedrock": "AWS Bedrock",
-        "gemini": "Google Gemini",
-        "mistral": "Mistral AI",
-        "groq": "Groq"
-    }.items():
-        status = "✅ Configured" if api_keys.get(provider) else "❌ Not configured"
-        st.markdown(f"- **{name}**: {status}")
+    # One markdown element for the whole list instead of one per provider
+    st.markdown("\n".join(
+        f"- **{name}**: {'✅ Configured' if has_api_key(provider) else '❌ Not configured'}"
+        for provider, name in PROVIDER_OPTIONS.items()
+    ))
     
     st.markdown("""
     To configure API keys, create a `.env` file in the application directory with your keys.
     """)
-    
+
+    # .env is only loaded once per process, so pick up edits to it explicitly
+    if st.button("Reload API Keys"):
+        load_settings.clear()
+        # Model lists fetched without a key (or with an old one) are stale too
+        _fetch_models_cached.clear()
+        _model_choices_cached.clear()
+        st.rerun()
+
+    # Clients are shared across sessions; rebuild them e.g. after network or proxy changes
+    if st.button("Reload Clients"):
+        reset_llm_clients()
+        st.success("LLM clients will be recreated on the next request.")
+
     if st.button("Create .env Template"):
         template = create_env_template()
         st.code(template, language="bash")
@@ -740,12 +893,23 @@ def render_settings_page(config):
     
     # Reset settings
     if st.button("Reset All Settings to Default"):
-        for key, value in DEFAULT_CONFIG.items():
-            config[key] = value
+        config.update(default_config())
         save_config(config)
         st.success("Settings reset to default values.")
 
+# Syntax highlighting language for File Browser previews, by file extension
+EXTENSION_LANGUAGES = MappingProxyType({
+    ".py": "python",
+    ".js": "javascript",
+    ".ts": "javascript",
+    ".html": "html",
+    ".htm": "html",
+    ".css": "css",
+    ".json": "json"
+})
+
 # File Browser UI
+@page_fragment
 def render_file_browser(config):
     st.title("File Browser")
     
@@ -777,25 +941,12 @@ def render_file_browser(config):
                 if os.path.isdir(item_path):
                     config['workspace_path'] = item_path
                     save_config(config)
-                    st.experimental_rerun()
+                    st.rerun()
                 else:
                     file_content = read_file(item_path)
                     file_extension = os.path.splitext(item_name)[1].lower()
                     
-                    if file_extension == ".py":
-                        language = "python"
-                    elif file_extension in [".js", ".ts"]:
-                        language = "javascript"
-                    elif file_extension in [".html", ".htm"]:
-                        language = "html"
-                    elif file_extension in [".css"]:
-                        language = "css"
-                    elif file_extension in [".json"]:
-                        language = "json"
-                    else:
-                        language = None
-                    
-                    st.code(file_content, language=language)
+                    st.code(file_content, language=EXTENSION_LANGUAGES.get(file_extension))
         
         # Go up one directory
         if st.button("Go Up One Directory"):
@@ -803,104 +954,112 @@ def render_file_browser(config):
             if os.path.exists(parent_dir):
                 config['workspace_path'] = parent_dir
                 save_config(config)
-                st.experimental_rerun()
+                st.rerun()
     
     except Exception as e:
         st.error(f"Error accessing directory: {str(e)}")
 
+# Documentation page content (static, built once at import)
+DOCS_MD: Final[str] = """## About Roo Pilot
+
+Roo Pilot is a standalone version of Roo Code that works outside of VS Code. It provides both command-line
+and graphical interfaces to interact with AI models for code assistance, question answering, and more.
+
+## Features
+
+- **Chat Interface**: Interact with AI models through a chat interface
+- **File Operations**: Read, write, and browse files
+- **Multiple LLM Support**: Works with Anthropic Claude, OpenAI GPT, and other providers
+- **Customizable**: Configure your preferred models, temperature, and other settings
+- **Dynamic Model Selection**: Fetches available models directly from providers when possible
+
+## Installation
+
+### Prerequisites
+
+- Python 3.8 or higher (for the Streamlit UI)
+- Node.js 20.x or higher (for the CLI version)
+- API keys for your preferred LLM providers
+
+### Setup
+
+1. Clone the repository
+2. Create a `.env` file with your API keys
+3. Run the installation script for your platform
+
+### Environment Variables
+
+Set these in your `.env` file:
+
+```
+ANTHROPIC_API_KEY=your_key_here
+OPENAI_API_KEY=your_key_here
+OPENROUTER_API_KEY=your_key_here
+AWS_ACCESS_KEY_ID=your_access_key
+AWS_SECRET_ACCESS_KEY=your_secret_key
+AWS_REGION=us-east-1
+GOOGLE_API_KEY=your_key_here
+MISTRAL_API_KEY=your_key_here
+GROQ_API_KEY=your_key_here
+```
+
+## Usage
+
+### Streamlit UI
+
+Run the Streamlit UI with:
+
+```
+streamlit run streamlit_app.py
+```
+
+### CLI Mode
+
+Run the CLI with:
+
+```
+roo-pilot-cli
+```
+
+### Commands
+
+Once in the chat interface, you can use these commands:
+
+- `/read path` - Read file content
+- `/write path content` - Write content to a file
+- `/ls [path]` - List files in a directory
+- `/clear` - Clear chat history
+- `/help` - Show help information
+
+## Development
+
+Contributions are welcome! Please see the CONTRIBUTING.md file for guidelines.
+"""
+
 # Documentation UI
-def render_documentation():
+def render_documentation(config):
     st.title("Roo Pilot Documentation")
     
-    st.markdown("""
-    ## About Roo Pilot
-    
-    Roo Pilot is a standalone version of Roo Code that works outside of VS Code. It provides both command-line 
-    and graphical interfaces to interact with AI models for code assistance, question answering, and more.
-    
-    ## Features
-    
-    - **Chat Interface**: Interact with AI models through a chat interface
-    - **File Operations**: Read, write, and browse files
-    - **Multiple LLM Support**: Works with Anthropic Claude, OpenAI GPT, and other providers
-    - **Customizable**: Configure your preferred models, temperature, and other settings
-    - **Dynamic Model Selection**: Fetches available models directly from providers when possible
-    
-    ## Installation
-    
-    ### Prerequisites
-    
-    - Python 3.8 or higher (for the Streamlit UI)
-    - Node.js 20.x or higher (for the CLI version)
-    - API keys for your preferred LLM providers
-    
-    ### Setup
-    
-    1. Clone the repository
-    2. Create a `.env` file with your API keys
-    3. Run the installation script for your platform
-    
-    ### Environment Variables
-    
-    Set these in your `.env` file:
-    
-    ```
-    ANTHROPIC_API_KEY=your_key_here
-    OPENAI_API_KEY=your_key_here
-    OPENROUTER_API_KEY=your_key_here
-    AWS_ACCESS_KEY_ID=your_access_key
-    AWS_SECRET_ACCESS_KEY=your_secret_key
-    AWS_REGION=us-east-1
-    GOOGLE_API_KEY=your_key_here
-    MISTRAL_API_KEY=your_key_here
-    GROQ_API_KEY=your_key_here
-    ```
-    
-    ## Usage
-    
-    ### Streamlit UI
-    
-    Run the Streamlit UI with:
-    
-    ```
-    streamlit run streamlit_app.py
-    ```
-    
-    ### CLI Mode
-    
-    Run the CLI with:
-    
-    ```
-    roo-pilot-cli
-    ```
-    
-    ### Commands
-    
-    Once in the chat interface, you can use these commands:
-    
-    - `/read path` - Read file content
-    - `/write path content` - Write content to a file
-    - `/ls [path]` - List files in a directory
-    - `/clear` - Clear chat history
-    - `/help` - Show help information
-    
-    ## Development
-    
-    Contributions are welcome! Please see the CONTRIBUTING.md file for guidelines.
-    """)
+    st.markdown(DOCS_MD)
+
+# Page renderers by navigation label (insertion order is the sidebar order)
+PAGES = MappingProxyType({
+    "Chat": render_chat_page,
+    "Settings": render_settings_page,
+    "File Browser": render_file_browser,
+    "Documentation": render_documentation
+})
 
 # Main function
 def main():
     page, config = render_sidebar()
     
-    if page == "Chat":
-        render_chat_page(config)
-    elif page == "Settings":
-        render_settings_page(config)
-    elif page == "File Browser":
-        render_file_browser(config)
-    elif page == "Documentation":
-        render_documentation()
+    PAGES[page](config)
+    
+    # Persist settings changed during this rerun in a single write
+    flush_config(config)
+    if st.session_state.get("config_dirty"):
+        st.sidebar.button("Save Settings", on_click=flush_config, args=(config,), kwargs={"force": True})
 
 if __name__ == "__main__":
     main()
\ No newline at end of file